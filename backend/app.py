@@ -1,36 +1,112 @@
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import ee
+import orjson
 import os
+import re
+import time
+import base64
+import hashlib
+import tempfile
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# GEE configuration - read once at import, it does not change at runtime
+_GEE_PROJECT = os.environ.get('GOOGLE_EARTH_ENGINE_PROJECT_ID')
+_SA_KEY = os.environ.get('GOOGLE_SERVICE_ACCOUNT_KEY')
+_SA_EMAIL = os.environ.get('GOOGLE_SERVICE_ACCOUNT_EMAIL')
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that serializes responses with orjson instead of the stdlib json module"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)  # All jsonify() calls go through orjson
 CORS(app)  # Enable CORS for all routes
 
+# Service account key values that look like a file path: absolute (POSIX or Windows) or *.json
+_PATH_RE = re.compile(r'^(?:[/\\]|[A-Za-z]:[\\/])|\.json$')
+
+# Visualization parameters for temperature display
+# Temperature range: 15°C to 40°C, Color palette: blue (cold) to red (hot)
+_VIS_LST = {
+    'min': 15,
+    'max': 40,
+    'palette': ('blue', 'yellow', 'red')
+}
+
+# Visualization parameters for NDVI display
+# NDVI range: 0 to 1, Color palette: red (bare soil) to green (vegetation)
+_VIS_NDVI = {
+    'min': 0,
+    'max': 0.8,
+    'palette': ('brown', 'yellow', 'lightgreen', 'darkgreen')
+}
+
+# Tile URL templates for Leaflet, used when getMapId() returns no tile_fetcher
+# ({{z}}/{{x}}/{{y}} survive str.format() as Leaflet placeholders)
+_TILE_TMPL_WITH_TOKEN = "https://earthengine.googleapis.com/v1/projects/{project}/maps/{mid}/tiles/{{z}}/{{x}}/{{y}}?token={token}"
+_TILE_TMPL_NO_TOKEN = "https://earthengine.googleapis.com/v1/{mid}/tiles/{{z}}/{{x}}/{{y}}"
+
+# Earth Engine client - imported lazily by initialize_gee() since it is slow to import
+ee = None
+
+# GEE session state - initialization runs once per process and is reused by all requests
+_gee_project_id = None
+_gee_lock = threading.Lock()
+
+# Default Area of Interest for Amazon rainforest, built once GEE is initialized
+_DEFAULT_AOI = None
+
+# Unfiltered dataset handles, created on first use and shared across requests
+_LST_COLLECTION = None
+_NDVI_COLLECTION = None
+
 def initialize_gee():
+    """Initialize Google Earth Engine once per process and return the project ID"""
+    global ee, _gee_project_id, _DEFAULT_AOI
+    if _gee_project_id is not None:
+        return _gee_project_id
+    
+    with _gee_lock:
+        # Another request may have finished initialization while we waited
+        if _gee_project_id is None:
+            import ee
+            project_id = _initialize_gee()
+            # Coordinates: [west, south, east, north] in degrees - covers central Amazon region
+            _DEFAULT_AOI = ee.Geometry.Rectangle([-65.0, -10.0, -55.0, -2.0])
+            _gee_project_id = project_id
+    
+    return _gee_project_id
+
+def _initialize_gee():
     """Initialize Google Earth Engine with flexible authentication"""
     try:
         # Get project ID from environment variable
-        project_id = os.environ.get('GOOGLE_EARTH_ENGINE_PROJECT_ID')
+        project_id = _GEE_PROJECT
         if not project_id:
             raise ValueError("GOOGLE_EARTH_ENGINE_PROJECT_ID not found in environment variables")
         
         # Check for service account credentials first
-        service_account_key = os.environ.get('GOOGLE_SERVICE_ACCOUNT_KEY')
-        service_account_email = os.environ.get('GOOGLE_SERVICE_ACCOUNT_EMAIL')
+        service_account_key = _SA_KEY
+        service_account_email = _SA_EMAIL
         
         if service_account_key and service_account_email:
             # Use service account authentication (for production)
-            import json
-            import tempfile
-            
             # Parse the service account key (it might be JSON string or file path)
-            if (service_account_key.startswith('/') or 
-                (len(service_account_key) > 3 and service_account_key[1] == ':') or
-                service_account_key.endswith('.json')):
+            if _PATH_RE.search(service_account_key):
                 # It's a file path (absolute, relative, or ends with .json)
                 credentials = ee.ServiceAccountCredentials(service_account_email, service_account_key)
             else:
@@ -41,7 +117,6 @@ def initialize_gee():
                         f.write(service_account_key)
                     else:
                         # Base64 encoded JSON (common in CI/CD)
-                        import base64
                         decoded_key = base64.b64decode(service_account_key).decode('utf-8')
                         f.write(decoded_key)
                     key_file_path = f.name
@@ -70,6 +145,224 @@ def initialize_gee():
     except Exception as e:
         raise Exception(f"Failed to initialize Google Earth Engine: {str(e)}")
 
+@functools.lru_cache(maxsize=512)
+def _date_range(year, month):
+    """Return the (start_date, end_date) ISO strings covering the given month"""
+    start_date = f'{year}-{month:02d}-01'
+    if month == 12:
+        end_date = f'{year + 1}-01-01'
+    else:
+        end_date = f'{year}-{month + 1:02d}-01'
+    return start_date, end_date
+
+def _validate_ymd(year, month):
+    """Return an error message if year/month is out of range or in the future, else None"""
+    current_date = datetime.now()
+    
+    if not (2000 <= year <= current_date.year):
+        return f"Year must be between 2000 and {current_date.year}"
+    if not (1 <= month <= 12):
+        return "Month must be between 1 and 12"
+    
+    # Don't allow future dates beyond current month
+    if year > current_date.year or (year == current_date.year and month > current_date.month):
+        return "Cannot request future dates"
+    return None
+
+def _get_collection(data_type):
+    """Return the shared, unfiltered ImageCollection for a data type"""
+    global _LST_COLLECTION, _NDVI_COLLECTION
+    if data_type == 'LST':
+        if _LST_COLLECTION is None:
+            # Fetch MODIS Land Surface Temperature data
+            # MODIS/061/MOD11A2 provides 8-day LST composite at 1km resolution with better coverage
+            _LST_COLLECTION = ee.ImageCollection('MODIS/061/MOD11A2')
+        return _LST_COLLECTION
+    else:  # NDVI
+        if _NDVI_COLLECTION is None:
+            # Fetch Sentinel-2 Surface Reflectance data
+            # COPERNICUS/S2_SR_HARMONIZED provides 10m resolution with good temporal coverage
+            _NDVI_COLLECTION = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+        return _NDVI_COLLECTION
+
+@functools.lru_cache(maxsize=128)
+def _parse_aoi(aoi_param):
+    """Parse a custom AOI parameter from the frontend into an ee.Geometry"""
+    aoi_data = orjson.loads(aoi_param)
+    if aoi_data['type'] == 'rectangle':
+        # Rectangle format: [west, south, east, north]
+        bounds = aoi_data['bounds']
+        aoi = ee.Geometry.Rectangle(bounds)
+    elif aoi_data['type'] == 'polygon':
+        # Polygon format: coordinates array
+        coordinates = aoi_data['coordinates']
+        aoi = ee.Geometry.Polygon([coordinates])
+    else:
+        raise ValueError("Unsupported AOI type")
+    print(f"Using custom AOI: {aoi_data['type']}")
+    return aoi
+
+def _compute_tile_url(data_type, year, month, aoi):
+    """Run the GEE pipeline for a map request and return the tile URL template
+    
+    Raises ValueError when GEE cannot produce map tiles for the request.
+    """
+    project_id = initialize_gee()
+    
+    # Choose collection and processing based on data type
+    collection = _get_collection(data_type)
+    
+    # Create date range for the selected month
+    start_date, end_date = _date_range(year, month)
+    
+    print(f"Filtering {data_type} data for date range: {start_date} to {end_date}")
+    
+    # Filter by date range using the dynamic dates
+    filtered_collection = collection.filterDate(start_date, end_date)
+    
+    # Filter by the AOI bounds
+    filtered_collection = filtered_collection.filterBounds(aoi)
+    
+    # Get image based on data type
+    if data_type == 'LST':
+        # For LST, get the most recent image
+        image = ee.Image(filtered_collection.limit(1, 'system:time_start', False).first())
+        bands = ['LST_Day_1km']
+    else:  # NDVI
+        # For NDVI, use median composite to get better coverage across AOI
+        # (only the bands NDVI needs, so the reducer composites 2 bands instead of 13)
+        image = filtered_collection.select(['B8', 'B4']).median()
+        # Scale reflectance once on the composite instead of mapping over every image
+        image = image.divide(10000)
+        bands = ['B8', 'B4']
+    
+    # Handle an empty collection server-side instead of probing with getInfo():
+    # fall back to a fully masked image so getMapId still succeeds (transparent tiles)
+    empty_image = ee.Image.constant([0] * len(bands)).rename(bands).updateMask(0)
+    image = ee.Image(ee.Algorithms.If(filtered_collection.size().gt(0), image, empty_image))
+    
+    # Process image based on data type
+    if data_type == 'LST':
+        # Select the LST_Day_1km band (Land Surface Temperature - Day)
+        lst_band = image.select('LST_Day_1km')
+        
+        # Apply scale factor (0.02) and convert from Kelvin to Celsius
+        # MODIS LST data comes in Kelvin * 50 (scale factor 0.02)
+        processed_image = lst_band.multiply(0.02).subtract(273.15)
+        
+        vis_params = _VIS_LST
+    else:  # NDVI
+        # Calculate NDVI from Sentinel-2 bands
+        # NDVI = (NIR - Red) / (NIR + Red)
+        nir = image.select('B8')  # Near Infrared
+        red = image.select('B4')  # Red
+        ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
+        
+        processed_image = ndvi
+        
+        vis_params = _VIS_NDVI
+    
+    # Clip the image to the AOI
+    processed_image = processed_image.clip(aoi)
+    
+    # Generate map tile information using getMapId()
+    # This creates a map ID and token for tile serving
+    try:
+        map_id = processed_image.getMapId(vis_params)
+        print(f"Map ID response: {map_id}")
+    except Exception as e:
+        raise ValueError(f"Failed to generate map ID: {str(e)}")
+    
+    # Check if map ID was generated successfully
+    if not map_id or not map_id.get('mapid'):
+        raise ValueError(f"Failed to generate map tiles. Map ID: {map_id}")
+    
+    # Handle the newer GEE API format where token might be empty
+    # Use the tile_fetcher's URL template directly
+    if 'tile_fetcher' in map_id and hasattr(map_id['tile_fetcher'], 'url_format'):
+        # Use tile_fetcher URL format (newer API)
+        tile_url = map_id['tile_fetcher'].url_format
+    else:
+        # Construct the full tile layer URL for Leaflet
+        # For newer API without token, use direct mapid access
+        if map_id.get('token'):
+            # The templated URL needs just the last segment of the map ID
+            tile_url = _TILE_TMPL_WITH_TOKEN.format(
+                project=project_id,
+                mid=map_id['mapid'].rpartition('/')[2],
+                token=map_id['token']
+            )
+        else:
+            # Use the full mapid path for newer API
+            tile_url = _TILE_TMPL_NO_TOKEN.format(mid=map_id['mapid'])
+    
+    return tile_url
+
+# Response caches - GEE map IDs expire after a while, so entries are kept for an hour at most
+_CACHE_TTL = 3600  # seconds
+_CACHE_MAXSIZE = 256
+_tile_url_cache = OrderedDict()
+_pixel_value_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cache_get(cache, key):
+    """Return a cached value, or None if missing or expired"""
+    with _cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return value
+
+def _cache_put(cache, key, value):
+    """Store a value, evicting the least recently used entries beyond the size limit"""
+    with _cache_lock:
+        cache[key] = (value, time.monotonic() + _CACHE_TTL)
+        cache.move_to_end(key)
+        while len(cache) > _CACHE_MAXSIZE:
+            cache.popitem(last=False)
+
+# Background workers that warm the tile URL cache for neighbouring months
+_PREWARM_POOL = ThreadPoolExecutor(max_workers=2)
+# Cache keys queued or running on the pool; jobs beyond the limit are dropped, not queued
+_PREWARM_MAX_PENDING = 4
+_prewarm_pending = set()
+_prewarm_lock = threading.Lock()
+
+def _get_tile_url(data_type, year, month, aoi_key, aoi):
+    """Return the tile URL for a map request, serving repeat requests from the cache"""
+    cache_key = (data_type, year, month, aoi_key)
+    tile_url = _cache_get(_tile_url_cache, cache_key)
+    if tile_url is None:
+        tile_url = _compute_tile_url(data_type, year, month, aoi)
+        _cache_put(_tile_url_cache, cache_key, tile_url)
+    return tile_url
+
+def _prewarm_tile_url(data_type, year, month, aoi_key, aoi):
+    """Populate the tile URL cache for a month the user is likely to request next"""
+    try:
+        _get_tile_url(data_type, year, month, aoi_key, aoi)
+    except Exception as e:
+        print(f"Error prewarming {data_type} tiles for {year}-{month:02d}: {e}")
+    finally:
+        with _prewarm_lock:
+            _prewarm_pending.discard((data_type, year, month, aoi_key))
+
+def _schedule_prewarm(data_type, year, month, aoi_key, aoi):
+    """Queue a prewarm unless the month is invalid, cached, already pending or the pool is busy"""
+    cache_key = (data_type, year, month, aoi_key)
+    if _validate_ymd(year, month) or _cache_get(_tile_url_cache, cache_key) is not None:
+        return
+    with _prewarm_lock:
+        if cache_key in _prewarm_pending or len(_prewarm_pending) >= _PREWARM_MAX_PENDING:
+            return
+        _prewarm_pending.add(cache_key)
+    _PREWARM_POOL.submit(_prewarm_tile_url, data_type, year, month, aoi_key, aoi)
+
 @app.route('/api/map', methods=['GET'])
 def get_map():
     try:
@@ -80,175 +373,45 @@ def get_map():
         aoi_param = request.args.get('aoi')  # Custom Area of Interest
         
         # Validate parameters with current date check
-        from datetime import datetime
-        current_date = datetime.now()
-        
-        if not (2000 <= year <= current_date.year):
-            return jsonify({"error": f"Year must be between 2000 and {current_date.year}"}), 400
-        if not (1 <= month <= 12):
-            return jsonify({"error": "Month must be between 1 and 12"}), 400
         if data_type not in ['LST', 'NDVI']:
             return jsonify({"error": "Data type must be 'LST' or 'NDVI'"}), 400
-            
-        # Don't allow future dates beyond current month
-        if year > current_date.year or (year == current_date.year and month > current_date.month):
-            return jsonify({"error": "Cannot request future dates"}), 400
+        date_error = _validate_ymd(year, month)
+        if date_error:
+            return jsonify({"error": date_error}), 400
         
-        # Initialize GEE and get project ID
-        project_id = initialize_gee()
+        # Initialize GEE
+        initialize_gee()
+        
+        # Key the tile URL cache on a digest of the raw AOI parameter
+        if aoi_param:
+            aoi_key = hashlib.blake2b(aoi_param.encode('utf-8'), digest_size=16).hexdigest()
+        else:
+            aoi_key = 'default'
         
         # Define Area of Interest (AOI)
         if aoi_param:
-            # Parse custom AOI from frontend
-            import json
+            # Parse custom AOI from frontend (cached, AOIs repeat across pan/zoom sessions)
             try:
-                aoi_data = json.loads(aoi_param)
-                if aoi_data['type'] == 'rectangle':
-                    # Rectangle format: [west, south, east, north]
-                    bounds = aoi_data['bounds']
-                    aoi = ee.Geometry.Rectangle(bounds)
-                elif aoi_data['type'] == 'polygon':
-                    # Polygon format: coordinates array
-                    coordinates = aoi_data['coordinates']
-                    aoi = ee.Geometry.Polygon([coordinates])
-                else:
-                    raise ValueError("Unsupported AOI type")
-                print(f"Using custom AOI: {aoi_data['type']}")
+                aoi = _parse_aoi(aoi_param)
             except Exception as e:
                 print(f"Error parsing custom AOI: {e}")
                 # Fall back to default Amazon region
-                aoi = ee.Geometry.Rectangle([-65.0, -10.0, -55.0, -2.0])
+                aoi = _DEFAULT_AOI
         else:
             # Default Area of Interest for Amazon rainforest
-            # Coordinates: [west, south, east, north] in degrees - covers central Amazon region
-            aoi = ee.Geometry.Rectangle([-65.0, -10.0, -55.0, -2.0])
-        
-        # Choose collection and processing based on data type
-        if data_type == 'LST':
-            # Fetch MODIS Land Surface Temperature data
-            # MODIS/061/MOD11A2 provides 8-day LST composite at 1km resolution with better coverage
-            collection = ee.ImageCollection('MODIS/061/MOD11A2')
-        else:  # NDVI
-            # Fetch Sentinel-2 Surface Reflectance data
-            # COPERNICUS/S2_SR_HARMONIZED provides 10m resolution with good temporal coverage
-            collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-        
-        # Create date range for the selected month
-        start_date = f'{year}-{month:02d}-01'
-        if month == 12:
-            end_date = f'{year + 1}-01-01'
-        else:
-            end_date = f'{year}-{month + 1:02d}-01'
-        
-        print(f"Filtering {data_type} data for date range: {start_date} to {end_date}")
-        
-        # Filter by date range using the dynamic dates
-        filtered_collection = collection.filterDate(start_date, end_date)
-        
-        # Filter by the AOI bounds
-        filtered_collection = filtered_collection.filterBounds(aoi)
-        
-        # Apply cloud masking for Sentinel-2 NDVI data
-        if data_type == 'NDVI':
-            def mask_s2_clouds(image):
-                # Simple approach: just scale the values and skip cloud masking for now
-                return image.divide(10000)
-            
-            filtered_collection = filtered_collection.map(mask_s2_clouds)
-        
-        # Add diagnostics - check collection size
-        collection_size = filtered_collection.size()
-        print(f"Collection size after filtering: {collection_size.getInfo()}")
-        
-        # Get image based on data type
-        if data_type == 'LST':
-            # For LST, get the most recent image
-            image = filtered_collection.sort('system:time_start', False).first()
-        else:  # NDVI
-            # For NDVI, use median composite to get better coverage across AOI
-            image = filtered_collection.median()
-        
-        # Add more detailed diagnostics
-        try:
-            image_info = image.getInfo()
-            print(f"Image info: {image_info}")
-            if not image_info:
-                error_msg = f"No {data_type} data available for the specified time range and location"
-                return jsonify({"error": error_msg})
-        except Exception as e:
-            return jsonify({"error": f"No data found: {str(e)}"})
-        
-        # Process image based on data type
-        if data_type == 'LST':
-            # Select the LST_Day_1km band (Land Surface Temperature - Day)
-            lst_band = image.select('LST_Day_1km')
-            
-            # Apply scale factor (0.02) and convert from Kelvin to Celsius
-            # MODIS LST data comes in Kelvin * 50 (scale factor 0.02)
-            processed_image = lst_band.multiply(0.02).subtract(273.15)
-            
-            # Apply smoothing to reduce pixelated appearance
-            processed_image = processed_image.focal_mean(2, 'square', 'pixels')
-            
-            # Define visualization parameters for temperature display
-            # Temperature range: 15°C to 40°C, Color palette: blue (cold) to red (hot)
-            vis_params = {
-                'min': 15,
-                'max': 40,
-                'palette': ['blue', 'yellow', 'red']
-            }
-        else:  # NDVI
-            # Calculate NDVI from Sentinel-2 bands
-            # NDVI = (NIR - Red) / (NIR + Red)
-            nir = image.select('B8')  # Near Infrared
-            red = image.select('B4')  # Red
-            ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
-            
-            processed_image = ndvi
-            
-            # Define visualization parameters for NDVI display
-            # NDVI range: 0 to 1, Color palette: red (bare soil) to green (vegetation)
-            vis_params = {
-                'min': 0,
-                'max': 0.8,
-                'palette': ['brown', 'yellow', 'lightgreen', 'darkgreen']
-            }
-        
-        # Clip the image to the AOI
-        processed_image = processed_image.clip(aoi)
+            aoi = _DEFAULT_AOI
         
-        # Generate map tile information using getMapId()
-        # This creates a map ID and token for tile serving
+        # Get the tile URL (cached for repeat requests)
         try:
-            map_id = processed_image.getMapId(vis_params)
-            print(f"Map ID response: {map_id}")
-        except Exception as e:
-            return jsonify({"error": f"Failed to generate map ID: {str(e)}"})
+            tile_url = _get_tile_url(data_type, year, month, aoi_key, aoi)
+        except ValueError as e:
+            return jsonify({"error": str(e)})
         
-        # Check if map ID was generated successfully
-        if not map_id or not map_id.get('mapid'):
-            return jsonify({"error": f"Failed to generate map tiles. Map ID: {map_id}"})
-        
-        # Handle the newer GEE API format where token might be empty
-        # Use the tile_fetcher's URL template directly
-        if 'tile_fetcher' in map_id and hasattr(map_id['tile_fetcher'], 'url_format'):
-            # Use tile_fetcher URL format (newer API)
-            tile_url = map_id['tile_fetcher'].url_format
-        else:
-            # Extract the actual map ID from the response
-            mapid_value = map_id['mapid']
-            if '/' in mapid_value:
-                actual_mapid = mapid_value.split('/')[-1]
-            else:
-                actual_mapid = mapid_value
-            
-            # Construct the full tile layer URL for Leaflet
-            # For newer API without token, use direct mapid access
-            if map_id.get('token'):
-                tile_url = f"https://earthengine.googleapis.com/v1/projects/{project_id}/maps/{actual_mapid}/tiles/{{z}}/{{x}}/{{y}}?token={map_id['token']}"
-            else:
-                # Use the full mapid path for newer API
-                tile_url = f"https://earthengine.googleapis.com/v1/{map_id['mapid']}/tiles/{{z}}/{{x}}/{{y}}"
+        # Warm the cache for the previous and next month while the user scrubs the time slider
+        prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+        next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        for adjacent_year, adjacent_month in (prev_month, next_month):
+            _schedule_prewarm(data_type, adjacent_year, adjacent_month, aoi_key, aoi)
         
         # Return the JSON response with the tile URL
         return jsonify({"url": tile_url})
@@ -257,6 +420,70 @@ def get_map():
         # Return error response with details
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+def _sample_pixel(data_type, year, month, lat, lng):
+    """Sample the GEE dataset at a point and return a dict with size, value and date"""
+    # Create point geometry from coordinates
+    point = ee.Geometry.Point([lng, lat])
+    
+    # Get data collection based on type
+    collection = _get_collection(data_type)
+    
+    # Create date range for the selected month
+    start_date, end_date = _date_range(year, month)
+    
+    # Filter collection
+    filtered_collection = collection.filterDate(start_date, end_date).filterBounds(point)
+    
+    # Get image based on data type
+    if data_type == 'LST':
+        # For LST, get the most recent image
+        image = ee.Image(filtered_collection.limit(1, 'system:time_start', False).first())
+    else:  # NDVI
+        # For NDVI, use median composite to get better coverage across AOI
+        # (only the bands NDVI needs, so the reducer composites 2 bands instead of 13)
+        image = filtered_collection.select(['B8', 'B4']).median()
+        # Scale reflectance once on the composite instead of mapping over every image
+        image = image.divide(10000)
+    
+    # Process based on data type
+    if data_type == 'LST':
+        # Select LST band and apply MODIS scale factor
+        lst_band = image.select('LST_Day_1km')
+        processed_band = lst_band.multiply(0.02).subtract(273.15)
+        band_name = 'LST_Day_1km'
+    else:  # NDVI
+        # Calculate NDVI from Sentinel-2 bands
+        nir = image.select('B8')  # Near Infrared
+        red = image.select('B4')  # Red
+        ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
+        processed_band = ndvi
+        band_name = 'NDVI'
+    
+    # Read the pixel under the point at the dataset's native resolution
+    pixel = processed_band.reduceRegion(
+        reducer=ee.Reducer.first(),
+        geometry=point,
+        scale=1000 if data_type == 'LST' else 10
+    )
+    
+    # Image date for context - the NDVI median composite has no system:time_start
+    if data_type == 'LST':
+        image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd')
+    else:  # NDVI
+        image_date = ee.String(f"{year}-{month:02d} (composite)")
+    
+    # Resolve collection size, pixel value and image date in a single round trip.
+    # If() keeps the server from evaluating the pixel when there is no data.
+    collection_size = filtered_collection.size()
+    has_data = collection_size.gt(0)
+    result = ee.Dictionary({
+        'size': collection_size,
+        'value': ee.Algorithms.If(has_data, pixel.get(band_name), None),
+        'date': ee.Algorithms.If(has_data, image_date, None)
+    }).getInfo()
+    
+    return result
+
 @app.route('/api/pixel_value', methods=['GET'])
 def get_pixel_value():
     try:
@@ -276,51 +503,26 @@ def get_pixel_value():
             return jsonify({"error": "Longitude must be between -180 and 180"}), 400
         if data_type not in ['LST', 'NDVI']:
             return jsonify({"error": "Data type must be 'LST' or 'NDVI'"}), 400
-        from datetime import datetime
-        current_date = datetime.now()
-        
-        if not (2000 <= year <= current_date.year):
-            return jsonify({"error": f"Year must be between 2000 and {current_date.year}"}), 400
-        if not (1 <= month <= 12):
-            return jsonify({"error": "Month must be between 1 and 12"}), 400
-            
-        # Don't allow future dates beyond current month
-        if year > current_date.year or (year == current_date.year and month > current_date.month):
-            return jsonify({"error": "Cannot request future dates"}), 400
+        date_error = _validate_ymd(year, month)
+        if date_error:
+            return jsonify({"error": date_error}), 400
             
         # Initialize GEE
         initialize_gee()
         
-        # Create point geometry from coordinates
-        point = ee.Geometry.Point([lng, lat])
-        
-        # Get data collection based on type
-        if data_type == 'LST':
-            collection = ee.ImageCollection('MODIS/061/MOD11A2')
-        else:  # NDVI
-            collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+        # Quantize coordinates so nearby clicks share a cache entry
+        lat_key = round(lat, 4)
+        lng_key = round(lng, 4)
         
-        # Create date range for the selected month
-        start_date = f'{year}-{month:02d}-01'
-        if month == 12:
-            end_date = f'{year + 1}-01-01'
-        else:
-            end_date = f'{year}-{month + 1:02d}-01'
-        
-        # Filter collection
-        filtered_collection = collection.filterDate(start_date, end_date).filterBounds(point)
-        
-        # Apply cloud masking for Sentinel-2 NDVI data
-        if data_type == 'NDVI':
-            def mask_s2_clouds(image):
-                # Simple approach: just scale the values and skip cloud masking for now
-                return image.divide(10000)
-            
-            filtered_collection = filtered_collection.map(mask_s2_clouds)
+        # Serve repeat requests from the pixel value cache
+        cache_key = (data_type, year, month, lat_key, lng_key)
+        result = _cache_get(_pixel_value_cache, cache_key)
+        if result is None:
+            result = _sample_pixel(data_type, year, month, lat_key, lng_key)
+            _cache_put(_pixel_value_cache, cache_key, result)
         
         # Check if any data exists
-        collection_size = filtered_collection.size().getInfo()
-        if collection_size == 0:
+        if result.get('size') == 0:
             return jsonify({
                 "error": f"No {data_type} data available for this location and time period",
                 "lat": lat,
@@ -329,35 +531,8 @@ def get_pixel_value():
                 "month": month
             })
         
-        # Get image based on data type
-        if data_type == 'LST':
-            # For LST, get the most recent image
-            image = filtered_collection.sort('system:time_start', False).first()
-        else:  # NDVI
-            # For NDVI, use median composite to get better coverage across AOI
-            image = filtered_collection.median()
-        
-        # Process based on data type
-        if data_type == 'LST':
-            # Select LST band and apply MODIS scale factor
-            lst_band = image.select('LST_Day_1km')
-            processed_band = lst_band.multiply(0.02).subtract(273.15)
-            band_name = 'LST_Day_1km'
-            unit = '°C'
-        else:  # NDVI
-            # Calculate NDVI from Sentinel-2 bands
-            nir = image.select('B8')  # Near Infrared
-            red = image.select('B4')  # Red
-            ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
-            processed_band = ndvi
-            band_name = 'NDVI'
-            unit = ''
-        
-        # Sample the image at the point
-        sample = processed_band.sample(point, 1000).first()
-        
         # Get the pixel value
-        pixel_value = sample.get(band_name).getInfo()
+        pixel_value = result.get('value')
         
         if pixel_value is None:
             return jsonify({
@@ -370,10 +545,7 @@ def get_pixel_value():
             })
         
         # Get image date for context
-        if data_type == 'LST':
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-        else:  # NDVI - median composite doesn't have system:time_start
-            image_date = f"{year}-{month:02d} (composite)"
+        image_date = result.get('date')
         
         # Format response based on data type
         if data_type == 'LST':
@@ -403,5 +575,8 @@ def get_pixel_value():
         return jsonify({"error": f"Error getting pixel value: {str(e)}"}), 500
 
 if __name__ == '__main__':
-    # Run the Flask app on port 5000 with debug mode
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only. Handlers spend nearly all their time waiting on GEE,
+    # so in production run under gunicorn with async workers instead:
+    #   pip install -r requirements-server.txt
+    #   gunicorn -k gevent -w 4 --worker-connections 100 -b 0.0.0.0:5000 app:app
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
@@ -7,12 +7,17 @@ Automates the entire deployment process with one command
 import os
 import sys
 import json
+import base64
+import hashlib
 import zipfile
 import subprocess
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 import time
 from dotenv import load_dotenv
@@ -27,12 +32,35 @@ class LambdaDeployer:
         self.runtime = 'python3.9'
         self.memory_size = 1024
         self.timeout = 300  # 5 minutes
+        self.wheel_cache_dir = Path.home() / '.cache' / 'gee-mapper-wheels'
+        self.deps_cache_dir = Path.home() / '.cache' / 'gee-deploy'
+        self.pip_cache_dir = Path.home() / '.cache' / 'gee-deploy-pip'
+        self.zip_compresslevel = 1  # fastest deflate level
+        
+        # Resolve wheels for the Lambda runtime rather than the host interpreter
+        python_version = self.runtime.replace('python', '')
+        self.pip_platform_args = [
+            '--platform', 'manylinux2014_x86_64',
+            '--only-binary=:all:',
+            '--python-version', python_version,
+            '--implementation', 'cp',
+            '--abi', f"cp{python_version.replace('.', '')}"
+        ]
+        
+        # Keep connections alive between API calls and fail fast on network problems
+        self.boto_config = Config(
+            tcp_keepalive=True,
+            connect_timeout=5,
+            read_timeout=60,
+            retries={'max_attempts': 3, 'mode': 'standard'}
+        )
         
         # Initialize AWS clients
         try:
-            self.lambda_client = boto3.client('lambda', region_name=self.region)
-            self.apigateway_client = boto3.client('apigateway', region_name=self.region)
-            self.iam_client = boto3.client('iam')
+            self.lambda_client = boto3.client('lambda', region_name=self.region, config=self.boto_config)
+            self.apigateway_client = boto3.client('apigateway', region_name=self.region, config=self.boto_config)
+            self.iam_client = boto3.client('iam', config=self.boto_config)
+            self.s3_client = boto3.client('s3', region_name=self.region, config=self.boto_config)
         except NoCredentialsError:
             print("[ERROR] AWS credentials not found!")
             print("Set up credentials using:")
@@ -40,19 +68,25 @@ class LambdaDeployer:
             print("  export AWS_SECRET_ACCESS_KEY=your_secret_key") 
             print("  export AWS_REGION=us-east-1")
             sys.exit(1)
+        
+        # Resolve the account ID once; check_prerequisites reports any failure
+        self.account_id = None
+        self.credentials_error = None
+        try:
+            sts = boto3.client('sts', config=self.boto_config)
+            self.account_id = sts.get_caller_identity()['Account']
+        except Exception as e:
+            self.credentials_error = e
     
     def check_prerequisites(self):
         """Check if all required tools and credentials are available"""
         print("[CHECK] Checking prerequisites...")
         
         # Check AWS credentials
-        try:
-            sts = boto3.client('sts')
-            identity = sts.get_caller_identity()
-            print(f"[OK] AWS credentials valid (Account: {identity['Account']})")
-        except Exception as e:
-            print(f"[ERROR] AWS credentials error: {e}")
+        if not self.account_id:
+            print(f"[ERROR] AWS credentials error: {self.credentials_error}")
             return False
+        print(f"[OK] AWS credentials valid (Account: {self.account_id})")
         
         # Check required files
         required_files = ['lambda_function.py', 'requirements.txt']
@@ -69,50 +103,193 @@ class LambdaDeployer:
         else:
             print(f"[OK] GEE Project ID: {gee_project}")
         
+        # A key given as a .json path is read and inlined later, so it has to exist now
+        service_account_key = os.environ.get('GOOGLE_SERVICE_ACCOUNT_KEY')
+        if service_account_key and service_account_key.endswith('.json'):
+            if not os.path.isfile(service_account_key):
+                print(f"[ERROR] Service account key file not found: {service_account_key}")
+                print("  Set GOOGLE_SERVICE_ACCOUNT_KEY to an existing key file, or to the key as JSON or base64")
+                return False
+            print(f"[OK] Service account key file: {service_account_key}")
+        
         return True
     
-    def create_deployment_package(self):
-        """Create deployment ZIP package with all dependencies"""
-        print("[PACKAGE] Creating deployment package...")
+    def read_requirements(self):
+        """Return the requirement specifiers listed in requirements.txt"""
+        requirements = []
+        with open('requirements.txt') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    requirements.append(line)
+        return requirements
+    
+    def download_wheels(self):
+        """Download Lambda-compatible wheels for all requirements concurrently"""
+        requirements = self.read_requirements()
+        self.wheel_cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        def download(requirement):
+            # Each download resolves its own dependencies, so the cache ends up with the full tree
+            return requirement, subprocess.run([
+                sys.executable, '-m', 'pip', 'download', requirement,
+                '-d', str(self.wheel_cache_dir),
+                '--cache-dir', str(self.pip_cache_dir)
+            ] + self.pip_platform_args, capture_output=True, text=True)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(requirements)))) as executor:
+            results = list(executor.map(download, requirements))
+        
+        for requirement, result in results:
+            if result.returncode != 0:
+                print(f"[ERROR] Failed to download {requirement}: {result.stderr}")
+                if 'No matching distribution' in result.stderr:
+                    # Never fall back to compiling C extensions on the host
+                    print(f"  [INFO] No manylinux2014_x86_64 wheel found for {requirement}; "
+                          f"pin a version that ships one, or build that package with --no-binary in a Lambda-compatible container")
+                return False
+        return True
+    
+    def requirements_hash(self):
+        """Return a content hash of requirements.txt and the target runtime"""
+        with open('requirements.txt', 'rb') as f:
+            return hashlib.sha256(f.read() + self.runtime.encode('utf-8')).hexdigest()
+    
+    def write_zip_entry(self, zip_file, file_path, arc_path):
+        """Add a file with a fixed timestamp and permissions so rebuilds are byte-identical"""
+        info = zipfile.ZipInfo(arc_path, date_time=(1980, 1, 1, 0, 0, 0))
+        info.external_attr = 0o644 << 16
+        info.compress_type = zipfile.ZIP_DEFLATED
+        # ZipFile(compresslevel=...) is ignored when a ZipInfo is passed to open(..., 'w');
+        # the attribute is public as compress_level from Python 3.13
+        setattr(info, 'compress_level' if hasattr(info, 'compress_level') else '_compresslevel',
+                self.zip_compresslevel)
+        # Stream in 1 MB chunks instead of holding whole files (large .so wheels) in memory
+        with open(file_path, 'rb') as src, zip_file.open(info, 'w') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    
+    def prune_package_dir(self, package_dir):
+        """Remove files the Lambda runtime never loads and strip shared libraries"""
+        prune_dirs = {'tests', 'test', '__pycache__'}
+        prune_suffixes = ('.pyc', '.pyo', '.so.debug', '.h')
+        # Keep METADATA and entry points so importlib.metadata lookups still work
+        prune_dist_info = {'RECORD', 'INSTALLER', 'REQUESTED', 'WHEEL', 'direct_url.json'}
+        strip_tool = shutil.which('strip')
         
+        for root, dirs, files in os.walk(package_dir):
+            for name in [d for d in dirs if d in prune_dirs]:
+                shutil.rmtree(os.path.join(root, name))
+                dirs.remove(name)
+            
+            in_dist_info = root.endswith('.dist-info')
+            for file in files:
+                file_path = os.path.join(root, file)
+                if file.endswith(prune_suffixes) or (in_dist_info and file in prune_dist_info):
+                    os.remove(file_path)
+                elif strip_tool and (file.endswith('.so') or '.so.' in file):
+                    # Best effort: a non-ELF strip (e.g. on macOS) just leaves the file untouched
+                    subprocess.run([strip_tool, '--strip-unneeded', file_path], capture_output=True)
+    
+    def build_dependencies_zip(self, deps_zip_path):
+        """Install all dependencies into a staging directory and zip them as a layer"""
         # Create temporary directory
         with tempfile.TemporaryDirectory() as temp_dir:
             package_dir = os.path.join(temp_dir, 'package')
             os.makedirs(package_dir)
             
-            print("  [INSTALL] Installing dependencies...")
-            # Install dependencies to package directory
-            result = subprocess.run([
-                sys.executable, '-m', 'pip', 'install',
-                '-r', 'requirements.txt',
-                '-t', package_dir,
-                '--no-cache-dir'
-            ], capture_output=True, text=True)
+            uv = shutil.which('uv')
+            if uv:
+                print("  [INSTALL] Installing dependencies with uv...")
+                # uv resolves and downloads in parallel with its own cache, so no separate download step
+                result = subprocess.run([
+                    uv, 'pip', 'install',
+                    '-r', 'requirements.txt',
+                    '--target', package_dir,
+                    '--python', sys.executable,
+                    '--python-platform', 'x86_64-manylinux2014',
+                    '--python-version', self.runtime.replace('python', ''),
+                    '--only-binary', ':all:'
+                ], capture_output=True, text=True)
+            else:
+                print("  [DOWNLOAD] Downloading dependency wheels...")
+                # Download wheels for every requirement in parallel into a persistent cache
+                if not self.download_wheels():
+                    return False
+                
+                print("  [INSTALL] Installing dependencies...")
+                # Install dependencies to package directory from the local wheel cache only
+                result = subprocess.run([
+                    sys.executable, '-m', 'pip', 'install',
+                    '-r', 'requirements.txt',
+                    '-t', package_dir,
+                    '--no-index',
+                    '--find-links', str(self.wheel_cache_dir)
+                ] + self.pip_platform_args, capture_output=True, text=True)
             
             if result.returncode != 0:
                 print(f"[ERROR] Failed to install dependencies: {result.stderr}")
-                return None
+                return False
             
-            # Copy Lambda function
-            shutil.copy2('lambda_function.py', package_dir)
+            print("  [PRUNE] Removing tests, caches and debug symbols...")
+            self.prune_package_dir(package_dir)
             
-            # Copy .env if it exists (for local testing)
-            if os.path.exists('.env'):
-                shutil.copy2('.env', package_dir)
+            print(f"  [CREATE] Creating {deps_zip_path.name}...")
+            deps_zip_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Create ZIP file
-            zip_path = 'lambda_deployment.zip'
-            print(f"  [CREATE] Creating {zip_path}...")
+            # Write to a temporary name first so an interrupted build never leaves a bad cache entry
+            partial_path = deps_zip_path.with_suffix('.partial')
+            # Lambda only needs a valid zip, so trade a slightly larger file for much faster deflate
+            # Entries are sorted so identical dependencies always produce an identical zip
+            entries = []
+            for root, dirs, files in os.walk(package_dir):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    # Lambda layers expose python/ on sys.path
+                    arc_path = 'python/' + os.path.relpath(file_path, package_dir).replace(os.sep, '/')
+                    entries.append((arc_path, file_path))
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for root, dirs, files in os.walk(package_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_path = os.path.relpath(file_path, package_dir)
-                        zip_file.write(file_path, arc_path)
+            with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_DEFLATED,
+                                 compresslevel=self.zip_compresslevel) as zip_file:
+                for arc_path, file_path in sorted(entries):
+                    self.write_zip_entry(zip_file, file_path, arc_path)
+            os.replace(partial_path, deps_zip_path)
+        
+        return True
+    
+    def layer_zip_path(self):
+        """Return the cached dependency layer zip for the current requirements"""
+        return self.deps_cache_dir / f"layer-{self.requirements_hash()}.zip"
+    
+    def create_layer_package(self):
+        """Create the dependency layer ZIP unless it is already cached"""
+        # Dependencies are zipped once per requirements.txt content and reused across deploys
+        deps_zip_path = self.layer_zip_path()
+        if deps_zip_path.exists():
+            print(f"  [CACHE] Reusing cached dependencies: {deps_zip_path}")
+            return deps_zip_path
+        if not self.build_dependencies_zip(deps_zip_path):
+            return None
+        return deps_zip_path
+    
+    def create_deployment_package(self):
+        """Create the app code ZIP"""
+        print("[PACKAGE] Creating deployment package...")
+        
+        # The function ZIP only holds the app code; dependencies ship in the layer
+        zip_path = 'lambda_deployment.zip'
+        print(f"  [CREATE] Creating {zip_path}...")
+        
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=self.zip_compresslevel) as zip_file:
+            # Add Lambda function
+            self.write_zip_entry(zip_file, 'lambda_function.py', 'lambda_function.py')
             
-            print(f"[OK] Deployment package created: {zip_path}")
-            return zip_path
+            # Add .env if it exists (for local testing)
+            if os.path.exists('.env'):
+                self.write_zip_entry(zip_file, '.env', '.env')
+        
+        print(f"[OK] Deployment package created: {zip_path}")
+        return zip_path
     
     def create_iam_role(self):
         """Create or update IAM role for Lambda"""
@@ -152,23 +329,127 @@ class LambdaDeployer:
                     PolicyArn='arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole'
                 )
                 
-                # Wait for role to propagate
-                print("  [WAIT] Waiting for IAM role to propagate...")
-                time.sleep(10)
+                # Role propagation is handled by retrying create_function rather than a fixed sleep
                 print(f"[OK] Created IAM role: {role_name}")
             else:
                 raise
         
+        # Grant access to the optional tile cache table (put_role_policy overwrites, so reruns are safe)
+        table_name = os.environ.get('TILE_CACHE_TABLE')
+        if table_name:
+            self.iam_client.put_role_policy(
+                RoleName=role_name,
+                PolicyName='tile-cache-table',
+                PolicyDocument=json.dumps({
+                    "Version": "2012-10-17",
+                    "Statement": [
+                        {
+                            "Effect": "Allow",
+                            "Action": ["dynamodb:GetItem", "dynamodb:PutItem"],
+                            "Resource": f"arn:aws:dynamodb:{self.region}:{self.account_id}:table/{table_name}"
+                        }
+                    ]
+                })
+            )
+            print(f"[OK] Granted access to DynamoDB table: {table_name}")
+        
         return role_arn
     
-    def deploy_lambda_function(self, zip_path, role_arn):
-        """Deploy or update Lambda function"""
-        print("[LAMBDA] Deploying Lambda function...")
+    def create_function_with_retry(self, **kwargs):
+        """Create the Lambda function, backing off while a new IAM role propagates"""
+        delays = [0.5, 1, 2, 4, 8]
+        for attempt in range(len(delays) + 1):
+            try:
+                return self.lambda_client.create_function(**kwargs)
+            except ClientError as e:
+                # Lambda rejects a role it cannot assume yet with InvalidParameterValueException
+                if e.response['Error']['Code'] != 'InvalidParameterValueException' or attempt == len(delays):
+                    raise
+                print(f"  [WAIT] Waiting for IAM role to propagate ({delays[attempt]}s)...")
+                time.sleep(delays[attempt])
+    
+    def file_sha256(self, file_path):
+        """Return the base64 SHA-256 of a file, in the format Lambda reports as CodeSha256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return base64.b64encode(digest.digest()).decode('utf-8')
+    
+    def ensure_deploy_bucket(self):
+        """Return the S3 bucket used for deployment packages, creating it on first run"""
+        bucket = f"{self.function_name}-deploy-{self.account_id}-{self.region}"
+        try:
+            self.s3_client.head_bucket(Bucket=bucket)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchBucket'):
+                raise
+            print(f"  [CREATE] Creating deployment bucket: {bucket}")
+            # us-east-1 rejects an explicit LocationConstraint
+            if self.region == 'us-east-1':
+                self.s3_client.create_bucket(Bucket=bucket)
+            else:
+                self.s3_client.create_bucket(
+                    Bucket=bucket,
+                    CreateBucketConfiguration={'LocationConstraint': self.region}
+                )
+        return bucket
+    
+    def upload_package(self, zip_path):
+        """Upload the deployment package to S3 and return the Lambda Code location"""
+        bucket = self.ensure_deploy_bucket()
+        key = f"{self.function_name}/{os.path.basename(zip_path)}"
+        print(f"  [UPLOAD] Uploading package to s3://{bucket}/{key}...")
+        # Multipart upload with parallel parts; also lifts the 50 MB direct upload limit
+        self.s3_client.upload_file(
+            str(zip_path), bucket, key,
+            Config=TransferConfig(multipart_threshold=8 * 1024 * 1024, max_concurrency=10)
+        )
+        return {'S3Bucket': bucket, 'S3Key': key}
+    
+    def layer_name(self):
+        """Return the name of the dependency layer"""
+        return f"{self.function_name}-deps"
+    
+    def find_layer_version(self):
+        """Return the ARN of the published layer built from the current requirements, if any"""
+        description = f"requirements {self.requirements_hash()}"
+        
+        # Reuse the published version whose description carries the same requirements hash
+        versions = self.lambda_client.list_layer_versions(
+            LayerName=self.layer_name(),
+            CompatibleRuntime=self.runtime
+        )['LayerVersions']
+        for version in versions:
+            if version.get('Description') == description:
+                print(f"[OK] Dependency layer unchanged, reusing version {version['Version']}")
+                return version['LayerVersionArn']
+        return None
+    
+    def create_or_update_layer(self):
+        """Publish the dependency layer unless a version for these requirements already exists"""
+        print("[LAYER] Setting up dependency layer...")
+        
+        layer_arn = self.find_layer_version()
+        if layer_arn:
+            return layer_arn
         
-        # Read ZIP file
-        with open(zip_path, 'rb') as zip_file:
-            zip_content = zip_file.read()
+        # Only build the dependencies when no published version matches
+        deps_zip_path = self.create_layer_package()
+        if not deps_zip_path:
+            return None
         
+        response = self.lambda_client.publish_layer_version(
+            LayerName=self.layer_name(),
+            Description=f"requirements {self.requirements_hash()}",
+            Content=self.upload_package(deps_zip_path),
+            CompatibleRuntimes=[self.runtime]
+        )
+        print(f"[OK] Published dependency layer version {response['Version']}")
+        return response['LayerVersionArn']
+    
+    def build_environment(self):
+        """Build the Lambda environment variables from the local environment"""
         # Environment variables
         environment = {
             'Variables': {}
@@ -187,9 +468,8 @@ class LambdaDeployer:
             environment['Variables']['GOOGLE_SERVICE_ACCOUNT_EMAIL'] = service_account_email
             
             # For Lambda deployment, convert file path to base64 content
-            if service_account_key.endswith('.json') and os.path.exists(service_account_key):
+            if service_account_key.endswith('.json'):
                 print("  [INFO] Converting service account key file to base64 for Lambda")
-                import base64
                 with open(service_account_key, 'rb') as f:
                     key_content = base64.b64encode(f.read()).decode('utf-8')
                 environment['Variables']['GOOGLE_SERVICE_ACCOUNT_KEY'] = key_content
@@ -197,20 +477,58 @@ class LambdaDeployer:
                 # Already base64 or JSON string
                 environment['Variables']['GOOGLE_SERVICE_ACCOUNT_KEY'] = service_account_key
         
+        # Pass through the optional tile cache and logging settings
+        for name in ('TILE_CACHE_TABLE', 'TILE_URL_TTL', 'PRECOMPUTE_MONTHS', 'LOG_LEVEL'):
+            value = os.environ.get(name)
+            if value:
+                environment['Variables'][name] = value
+        
+        return environment
+    
+    def deployment_fingerprint(self, environment):
+        """Return a short hash of everything a deploy pushes to Lambda"""
+        digest = hashlib.sha256()
+        for file_path in ('requirements.txt', 'lambda_function.py', '.env'):
+            if os.path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    digest.update(f.read())
+        digest.update(json.dumps(environment, sort_keys=True).encode('utf-8'))
+        digest.update(f"{self.runtime}:{self.memory_size}:{self.timeout}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    def get_current_function_fingerprint(self):
+        """Return the fingerprint tagged on the deployed function, if any"""
         try:
-            # Try to update existing function
-            response = self.lambda_client.update_function_code(
-                FunctionName=self.function_name,
-                ZipFile=zip_content
-            )
-            print(f"[OK] Updated existing Lambda function: {self.function_name}")
-            
-            # Wait for function to be ready for configuration updates
-            print("  [WAIT] Waiting for function update to complete...")
-            waiter = self.lambda_client.get_waiter('function_updated')
-            waiter.wait(FunctionName=self.function_name)
+            # get_function returns the tags too, so this is a single API call
+            current = self.lambda_client.get_function(FunctionName=self.function_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return None
+            raise
+        return current.get('Tags', {}).get('deploy-fingerprint')
+    
+    def prepare_code(self):
+        """Create the deployment package and publish the dependency layer"""
+        # Publish dependency layer (skipped when requirements are unchanged)
+        layer_arn = self.create_or_update_layer()
+        if not layer_arn:
+            return None, None
+        
+        zip_path = self.create_deployment_package()
+        if not zip_path:
+            return None, None
+        
+        return zip_path, layer_arn
+    
+    def deploy_lambda_function(self, zip_path, role_arn, layer_arn, environment):
+        """Deploy or update Lambda function"""
+        print("[LAMBDA] Deploying Lambda function...")
+        
+        try:
+            current = self.lambda_client.get_function(FunctionName=self.function_name)
             
-            # Update configuration
+            # Attach the layer and environment before the code: the app-only package
+            # cannot import its dependencies until the layer is in place
             self.lambda_client.update_function_configuration(
                 FunctionName=self.function_name,
                 Runtime=self.runtime,
@@ -219,24 +537,47 @@ class LambdaDeployer:
                 Description='GEE Mapper Backend - Geospatial data visualization API',
                 Timeout=self.timeout,
                 MemorySize=self.memory_size,
-                Environment=environment
+                Environment=environment,
+                Layers=[layer_arn]
             )
             print(f"[OK] Updated Lambda function configuration")
             
+            # Wait for function to be ready for the code update
+            print("  [WAIT] Waiting for function update to complete...")
+            # Poll every second; small updates are usually ready within a few seconds
+            waiter = self.lambda_client.get_waiter('function_updated_v2')
+            waiter.wait(
+                FunctionName=self.function_name,
+                WaiterConfig={'Delay': 1, 'MaxAttempts': 30}
+            )
+            
+            # Skip the upload when the deployed code is byte-identical to the new package
+            if current['Configuration']['CodeSha256'] == self.file_sha256(zip_path):
+                response = current['Configuration']
+                print(f"[OK] Lambda code unchanged, skipping upload: {self.function_name}")
+            else:
+                # Try to update existing function
+                response = self.lambda_client.update_function_code(
+                    FunctionName=self.function_name,
+                    **self.upload_package(zip_path)
+                )
+                print(f"[OK] Updated existing Lambda function: {self.function_name}")
+            
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 # Create new function
                 print(f"  [CREATE] Creating new Lambda function: {self.function_name}")
-                response = self.lambda_client.create_function(
+                response = self.create_function_with_retry(
                     FunctionName=self.function_name,
                     Runtime=self.runtime,
                     Role=role_arn,
                     Handler='lambda_function.lambda_handler',
-                    Code={'ZipFile': zip_content},
+                    Code=self.upload_package(zip_path),
                     Description='GEE Mapper Backend - Geospatial data visualization API',
                     Timeout=self.timeout,
                     MemorySize=self.memory_size,
                     Environment=environment,
+                    Layers=[layer_arn],
                     Publish=True
                 )
                 print(f"[OK] Created Lambda function: {self.function_name}")
@@ -245,6 +586,113 @@ class LambdaDeployer:
         
         return response['FunctionArn']
     
+    def build_api_spec(self, api_name, lambda_arn):
+        """Build the OpenAPI definition for the /api/map and /api/pixel_value endpoints"""
+        # Integration with Lambda
+        lambda_uri = f"arn:aws:apigateway:{self.region}:lambda:path/2015-03-31/functions/{lambda_arn}/invocations"
+        
+        def endpoint():
+            return {
+                'get': {
+                    'responses': {'200': {'description': 'Proxied Lambda response'}},
+                    'x-amazon-apigateway-integration': {
+                        'type': 'aws_proxy',
+                        'httpMethod': 'POST',
+                        'uri': lambda_uri
+                    }
+                },
+                # OPTIONS method for CORS, answered by a mock integration
+                'options': {
+                    'responses': {
+                        '200': {
+                            'description': 'CORS preflight response',
+                            'headers': {
+                                'Access-Control-Allow-Headers': {'schema': {'type': 'string'}},
+                                'Access-Control-Allow-Methods': {'schema': {'type': 'string'}},
+                                'Access-Control-Allow-Origin': {'schema': {'type': 'string'}}
+                            }
+                        }
+                    },
+                    'x-amazon-apigateway-integration': {
+                        'type': 'mock',
+                        'requestTemplates': {'application/json': '{"statusCode": 200}'},
+                        'responses': {
+                            'default': {
+                                'statusCode': '200',
+                                'responseParameters': {
+                                    'method.response.header.Access-Control-Allow-Headers': "'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'",
+                                    'method.response.header.Access-Control-Allow-Methods': "'GET,OPTIONS'",
+                                    'method.response.header.Access-Control-Allow-Origin': "'*'"
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        
+        return {
+            'openapi': '3.0.1',
+            'info': {
+                'title': api_name,
+                'description': 'API Gateway for GEE Mapper Backend',
+                'version': '1.0'
+            },
+            # Create endpoints: /api/map and /api/pixel_value
+            'paths': {
+                '/api/map': endpoint(),
+                '/api/pixel_value': endpoint()
+            }
+        }
+    
+    def find_api_id(self, api_name):
+        """Return the ID of the REST API with the given name, or None"""
+        # List existing APIs
+        apis = self.apigateway_client.get_rest_apis()
+        for api in apis['items']:
+            if api['name'] == api_name:
+                return api['id']
+        return None
+    
+    def api_url(self, api_id):
+        """Return the invoke URL of the prod stage"""
+        return f"https://{api_id}.execute-api.{self.region}.amazonaws.com/prod"
+    
+    def has_invoke_permission(self, source_arn):
+        """Check whether the function policy already lets API Gateway invoke it from source_arn"""
+        try:
+            policy = self.lambda_client.get_policy(FunctionName=self.function_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return False
+            raise
+        
+        for statement in json.loads(policy['Policy']).get('Statement', []):
+            condition = statement.get('Condition', {}).get('ArnLike', {})
+            if condition.get('AWS:SourceArn') == source_arn:
+                return True
+        return False
+    
+    def add_invoke_permission(self, source_arn):
+        """Grant API Gateway invoke access under a stable statement ID"""
+        permission = {
+            'FunctionName': self.function_name,
+            'StatementId': 'apigateway-invoke',
+            'Action': 'lambda:InvokeFunction',
+            'Principal': 'apigateway.amazonaws.com',
+            'SourceArn': source_arn
+        }
+        try:
+            self.lambda_client.add_permission(**permission)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceConflictException':
+                raise
+            # The statement exists for an older API; replace it rather than adding another
+            self.lambda_client.remove_permission(
+                FunctionName=self.function_name,
+                StatementId='apigateway-invoke'
+            )
+            self.lambda_client.add_permission(**permission)
+    
     def create_api_gateway(self, lambda_arn):
         """Create or update API Gateway"""
         print("[API] Setting up API Gateway...")
@@ -252,114 +700,21 @@ class LambdaDeployer:
         api_name = f"{self.function_name}-api"
         
         try:
-            # List existing APIs
-            apis = self.apigateway_client.get_rest_apis()
-            api_id = None
-            
-            for api in apis['items']:
-                if api['name'] == api_name:
-                    api_id = api['id']
-                    print(f"[OK] Found existing API Gateway: {api_name}")
-                    break
-            
-            if not api_id:
-                # Create new API
+            api_id = self.find_api_id(api_name)
+            if api_id:
+                print(f"[OK] Found existing API Gateway: {api_name}")
+            else:
+                # Create new API with all resources, methods and integrations in one import
                 print(f"  [CREATE] Creating new API Gateway: {api_name}")
-                api_response = self.apigateway_client.create_rest_api(
-                    name=api_name,
-                    description='API Gateway for GEE Mapper Backend',
-                    endpointConfiguration={'types': ['REGIONAL']}
+                api_spec = self.build_api_spec(api_name, lambda_arn)
+                api_response = self.apigateway_client.import_rest_api(
+                    parameters={'endpointConfigurationTypes': 'REGIONAL'},
+                    body=json.dumps(api_spec).encode('utf-8')
                 )
                 api_id = api_response['id']
                 print(f"[OK] Created API Gateway: {api_name}")
-                
-                # Get root resource
-                resources = self.apigateway_client.get_resources(restApiId=api_id)
-                root_id = next(r['id'] for r in resources['items'] if r['path'] == '/')
-                
-                # Create /api resource
-                api_resource = self.apigateway_client.create_resource(
-                    restApiId=api_id,
-                    parentId=root_id,
-                    pathPart='api'
-                )
-                api_resource_id = api_resource['id']
-                
-                # Create endpoints: /api/map and /api/pixel_value
-                endpoints = ['map', 'pixel_value']
-                
-                for endpoint in endpoints:
-                    # Create resource
-                    resource = self.apigateway_client.create_resource(
-                        restApiId=api_id,
-                        parentId=api_resource_id,
-                        pathPart=endpoint
-                    )
-                    
-                    # Create GET method
-                    self.apigateway_client.put_method(
-                        restApiId=api_id,
-                        resourceId=resource['id'],
-                        httpMethod='GET',
-                        authorizationType='NONE'
-                    )
-                    
-                    # Create OPTIONS method for CORS
-                    self.apigateway_client.put_method(
-                        restApiId=api_id,
-                        resourceId=resource['id'],
-                        httpMethod='OPTIONS',
-                        authorizationType='NONE'
-                    )
-                    
-                    # Integration with Lambda
-                    lambda_uri = f"arn:aws:apigateway:{self.region}:lambda:path/2015-03-31/functions/{lambda_arn}/invocations"
-                    
-                    self.apigateway_client.put_integration(
-                        restApiId=api_id,
-                        resourceId=resource['id'],
-                        httpMethod='GET',
-                        type='AWS_PROXY',
-                        integrationHttpMethod='POST',
-                        uri=lambda_uri
-                    )
-                    
-                    # CORS method response (must come before integration response)
-                    self.apigateway_client.put_method_response(
-                        restApiId=api_id,
-                        resourceId=resource['id'],
-                        httpMethod='OPTIONS',
-                        statusCode='200',
-                        responseParameters={
-                            'method.response.header.Access-Control-Allow-Headers': True,
-                            'method.response.header.Access-Control-Allow-Methods': True,
-                            'method.response.header.Access-Control-Allow-Origin': True
-                        }
-                    )
-                    
-                    # CORS OPTIONS integration
-                    self.apigateway_client.put_integration(
-                        restApiId=api_id,
-                        resourceId=resource['id'],
-                        httpMethod='OPTIONS',
-                        type='MOCK',
-                        requestTemplates={'application/json': '{"statusCode": 200}'}
-                    )
-                    
-                    # CORS integration response (must come after method response)
-                    self.apigateway_client.put_integration_response(
-                        restApiId=api_id,
-                        resourceId=resource['id'],
-                        httpMethod='OPTIONS',
-                        statusCode='200',
-                        responseParameters={
-                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'",
-                            'method.response.header.Access-Control-Allow-Methods': "'GET,OPTIONS'",
-                            'method.response.header.Access-Control-Allow-Origin': "'*'"
-                        }
-                    )
-                    
-                    print(f"  [OK] Created endpoint: /api/{endpoint}")
+                for path in api_spec['paths']:
+                    print(f"  [OK] Created endpoint: {path}")
                 
                 # Deploy API
                 self.apigateway_client.create_deployment(
@@ -368,27 +723,19 @@ class LambdaDeployer:
                     description='Production deployment'
                 )
             
-            # Add Lambda permission for API Gateway (always do this)
-            # Get AWS account ID for proper ARN format
-            sts = boto3.client('sts')
-            account_id = sts.get_caller_identity()['Account']
+            # Add Lambda permission for API Gateway (only if the policy doesn't grant it yet)
+            source_arn = f"arn:aws:execute-api:{self.region}:{self.account_id}:{api_id}/*/*/*"
             
             try:
-                self.lambda_client.add_permission(
-                    FunctionName=self.function_name,
-                    StatementId=f"apigateway-{int(time.time())}",
-                    Action='lambda:InvokeFunction',
-                    Principal='apigateway.amazonaws.com',
-                    SourceArn=f"arn:aws:execute-api:{self.region}:{account_id}:{api_id}/*/*/*"
-                )
-                print("[OK] Added Lambda permission for API Gateway")
-            except ClientError as e:
-                if e.response['Error']['Code'] != 'ResourceConflictException':
-                    print(f"[WARNING] Could not add Lambda permission: {e}")
-                else:
+                if self.has_invoke_permission(source_arn):
                     print("[OK] Lambda permission already exists")
+                else:
+                    self.add_invoke_permission(source_arn)
+                    print("[OK] Added Lambda permission for API Gateway")
+            except ClientError as e:
+                print(f"[WARNING] Could not add Lambda permission: {e}")
                 
-            api_url = f"https://{api_id}.execute-api.{self.region}.amazonaws.com/prod"
+            api_url = self.api_url(api_id)
             print(f"[OK] API Gateway URL: {api_url}")
             return api_url
             
@@ -396,6 +743,58 @@ class LambdaDeployer:
             print(f"[ERROR] API Gateway setup failed: {e}")
             raise
     
+    def find_function_url(self):
+        """Return the function's URL without the trailing slash, or None if it has none"""
+        try:
+            response = self.lambda_client.get_function_url_config(FunctionName=self.function_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return None
+            raise
+        return response['FunctionUrl'].rstrip('/')
+    
+    def create_function_url(self):
+        """Create or update the public Function URL (payload format 2.0) with CORS"""
+        print("[URL] Setting up Function URL...")
+        
+        # Lambda answers preflights and adds the CORS headers, so handlers can return plain dicts
+        cors = {
+            'AllowOrigins': ['*'],
+            'AllowMethods': ['GET'],
+            'AllowHeaders': ['content-type']
+        }
+        
+        if self.find_function_url():
+            self.lambda_client.update_function_url_config(
+                FunctionName=self.function_name,
+                AuthType='NONE',
+                Cors=cors
+            )
+            print("[OK] Updated Function URL")
+        else:
+            self.lambda_client.create_function_url_config(
+                FunctionName=self.function_name,
+                AuthType='NONE',
+                Cors=cors
+            )
+            # AuthType NONE still needs a resource policy statement allowing public invokes
+            try:
+                self.lambda_client.add_permission(
+                    FunctionName=self.function_name,
+                    StatementId='function-url-public',
+                    Action='lambda:InvokeFunctionUrl',
+                    Principal='*',
+                    FunctionUrlAuthType='NONE'
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ResourceConflictException':
+                    raise
+            print("[OK] Created Function URL")
+        
+        function_url = self.find_function_url()
+        print(f"[OK] Function URL: {function_url}")
+        return function_url
+    
     def cleanup(self, zip_path):
         """Clean up temporary files"""
         if os.path.exists(zip_path):
@@ -415,31 +814,54 @@ class LambdaDeployer:
             if not self.check_prerequisites():
                 return False
             
-            # Create deployment package
-            zip_path = self.create_deployment_package()
+            # Skip everything when code, requirements and configuration match the last deploy
+            environment = self.build_environment()
+            fingerprint = self.deployment_fingerprint(environment)
+            if self.get_current_function_fingerprint() == fingerprint:
+                api_id = self.find_api_id(f"{self.function_name}-api")
+                function_url = self.find_function_url()
+                if api_id and function_url:
+                    print(f"\n[SKIP] Nothing changed since the last deployment ({fingerprint})")
+                    print(f"[URL] API URL: {self.api_url(api_id)}")
+                    print(f"[URL] Function URL: {function_url}")
+                    return True
+            
+            # Build the code and layer while the IAM role is set up (no data dependency)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                code_future = executor.submit(self.prepare_code)
+                role_future = executor.submit(self.create_iam_role)
+                zip_path, layer_arn = code_future.result()
+                role_arn = role_future.result()
             if not zip_path:
                 return False
             
-            # Create IAM role
-            role_arn = self.create_iam_role()
-            
             # Deploy Lambda function
-            lambda_arn = self.deploy_lambda_function(zip_path, role_arn)
+            lambda_arn = self.deploy_lambda_function(zip_path, role_arn, layer_arn, environment)
             
             # Create API Gateway
             api_url = self.create_api_gateway(lambda_arn)
             
+            # Create Function URL (payload format 2.0, CORS handled by Lambda)
+            function_url = self.create_function_url()
+            
+            # Record what was deployed so an identical rerun can be skipped
+            self.lambda_client.tag_resource(
+                Resource=lambda_arn,
+                Tags={'deploy-fingerprint': fingerprint}
+            )
+            
             # Cleanup
             self.cleanup(zip_path)
             
             print("\n[SUCCESS] Deployment completed successfully!")
             print(f"[URL] API URL: {api_url}")
+            print(f"[URL] Function URL: {function_url}")
             print(f"[TEST] Test endpoints:")
             print(f"   • Map tiles: {api_url}/api/map?year=2024&month=7")
             print(f"   • Pixel value: {api_url}/api/pixel_value?lat=-6&lng=-60&year=2024&month=7")
             print()
             print("[INFO] Next steps:")
-            print("   1. Update your frontend VITE_API_BASE_URL to use the API URL above")
+            print("   1. Update your frontend VITE_API_BASE_URL to use the Function URL (or the API URL) above")
             print("   2. Test the endpoints in your browser or with curl")
             if not os.environ.get('GOOGLE_EARTH_ENGINE_PROJECT_ID'):
                 print("   3. Set GOOGLE_EARTH_ENGINE_PROJECT_ID in Lambda environment variables")
@@ -466,6 +888,8 @@ def main():
         print()
         print("Optional environment variables:")
         print("  GOOGLE_EARTH_ENGINE_PROJECT_ID - GEE project ID")
+        print("  GOOGLE_SERVICE_ACCOUNT_EMAIL   - GEE service account email")
+        print("  GOOGLE_SERVICE_ACCOUNT_KEY     - Key file path (.json), or the key as JSON or base64")
         print()
         return
     
@@ -1,14 +1,134 @@
-import json
 import os
-import ee
-from dotenv import load_dotenv
+import logging
+import base64
+import hashlib
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import orjson
 
-# Load environment variables from .env file (for local testing)
-load_dotenv()
+def _log_level():
+    """Return the LOG_LEVEL setting as a logging level, falling back to INFO if it is unknown"""
+    level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').strip().upper())
+    return level if isinstance(level, int) else logging.INFO
+
+# Lambda attaches its handler to the root logger; %-style args are only formatted if emitted
+logger = logging.getLogger()
+logger.setLevel(_log_level())
+
+# earthengine-api is imported on first use so OPTIONS and 404 cold starts skip it
+ee = None
+
+# .env is loaded on first use so OPTIONS and 404 cold starts skip python-dotenv
+_ENV_LOADED = False
+
+# GEE is initialized once per Lambda container and reused across warm invocations
+_GEE_INITIALIZED = False
+_GEE_PROJECT_ID = None
+_EE_KEY_PATH = '/tmp/ee_key.json'
+
+# High-volume endpoint for concurrent, automated requests like ours
+_EE_HIGHVOLUME_URL = 'https://earthengine-highvolume.googleapis.com'
+
+# Issues independent GEE requests concurrently within one invocation
+_EE_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Dataset IDs and visualization parameters shared by both handlers
+_LST_COLLECTION = 'MODIS/061/MOD11A2'
+_NDVI_COLLECTION = 'COPERNICUS/S2_SR_HARMONIZED'
+_LST_VIS = {
+    'min': 15,
+    'max': 40,
+    'palette': ['blue', 'yellow', 'red']
+}
+_NDVI_VIS = {
+    'min': 0,
+    'max': 0.8,
+    'palette': ['brown', 'yellow', 'lightgreen', 'darkgreen']
+}
+
+# Every JSON response shares one headers dict instead of rebuilding it
+_JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+def _err(code, msg, **context):
+    """Build a JSON error response, with optional extra fields echoed back"""
+    return {
+        'statusCode': code,
+        'headers': _JSON_HEADERS,
+        'body': orjson.dumps({"error": msg, **context}).decode()
+    }
+
+# (timestamp, (year, month)) - the upper bound only changes monthly, so refresh hourly
+_now_cache = [0, (0, 0)]
+
+def _current_ym():
+    """Return the current (year, month), recomputed at most once an hour"""
+    now = time.time()
+    if now - _now_cache[0] > 3600:
+        current_date = datetime.now()
+        _now_cache[:] = [now, (current_date.year, current_date.month)]
+    return _now_cache[1]
+
+def _ok(event, data):
+    """Build a 200 JSON response for the event's payload format"""
+    # Payload format 2.0 (the Function URL deploy.py creates) serializes a plain dict once
+    # on the platform side, and its CORS configuration adds the headers
+    if event.get('version') == '2.0':
+        return data
+    return {
+        'statusCode': 200,
+        'headers': _JSON_HEADERS,
+        'body': orjson.dumps(data).decode()
+    }
+
+def _validate_common(query_params):
+    """Parse and validate year/month/type; return (year, month, data_type, error_response)"""
+    current_year, current_month = _current_ym()
+    
+    year = int(query_params.get('year', 2024))
+    month = int(query_params.get('month', 7))
+    data_type = query_params.get('type', 'LST').upper()
+    
+    if not (2000 <= year <= current_year):
+        return None, None, None, _err(400, f"Year must be between 2000 and {current_year}")
+    if not (1 <= month <= 12):
+        return None, None, None, _err(400, "Month must be between 1 and 12")
+    if data_type not in ['LST', 'NDVI']:
+        return None, None, None, _err(400, "Data type must be 'LST' or 'NDVI'")
+    
+    # Don't allow future dates
+    if year == current_year and month > current_month:
+        return None, None, None, _err(400, "Cannot request future dates")
+    
+    return year, month, data_type, None
+
+def _month_range(year, month):
+    """Return the (start, end) date strings covering the given month"""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f'{year}-{month:02d}-01', f'{next_year}-{next_month:02d}-01'
+
+def _load_env():
+    """Load .env (local testing) once and apply the settings read from it"""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        from dotenv import load_dotenv
+        load_dotenv()
+        logger.setLevel(_log_level())
+        _ENV_LOADED = True
 
 def initialize_gee():
     """Initialize Google Earth Engine with flexible authentication"""
+    global ee, _GEE_INITIALIZED, _GEE_PROJECT_ID
+    if _GEE_INITIALIZED:
+        return _GEE_PROJECT_ID
+    
     try:
+        import ee
+        
+        # Load environment variables from .env file (for local testing)
+        _load_env()
+        
         # Get project ID from environment variable
         project_id = os.environ.get('GOOGLE_EARTH_ENGINE_PROJECT_ID')
         if not project_id:
@@ -20,38 +140,39 @@ def initialize_gee():
         
         if service_account_key and service_account_email:
             # Use service account authentication (preferred for Lambda)
-            import json
-            import tempfile
             
             # Parse the service account key (it might be JSON string or file path)
-            if (service_account_key.startswith('/') or 
-                (len(service_account_key) > 3 and service_account_key[1] == ':') or
-                service_account_key.endswith('.json')):
-                # It's a file path (absolute, relative, or ends with .json)
+            # The length guard avoids stat-ing an inline key blob as if it were a path
+            is_path = len(service_account_key) < 4096 and os.path.isfile(service_account_key)
+            if is_path:
+                # It's an existing key file
                 credentials = ee.ServiceAccountCredentials(service_account_email, service_account_key)
             else:
-                # It's a JSON string, create temporary file
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                    if service_account_key.startswith('{'):
-                        # Already JSON string
-                        f.write(service_account_key)
-                    else:
-                        # Base64 encoded JSON (common in CI/CD)
-                        import base64
-                        decoded_key = base64.b64decode(service_account_key).decode('utf-8')
-                        f.write(decoded_key)
-                    key_file_path = f.name
+                # It's a JSON string; write it to a fixed path (once per container, since
+                # initialization is cached) so a key left by an earlier deploy is replaced
+                if service_account_key.startswith('{'):
+                    # Already JSON string
+                    key_json = service_account_key
+                else:
+                    # Base64 encoded JSON (common in CI/CD)
+                    key_json = base64.b64decode(service_account_key).decode('utf-8')
+                # Owner-only permissions, like the mkstemp file this replaced (fchmod covers
+                # a file an earlier version created with the default umask)
+                fd = os.open(_EE_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                os.fchmod(fd, 0o600)
+                with os.fdopen(fd, 'w') as f:
+                    f.write(key_json)
                 
-                credentials = ee.ServiceAccountCredentials(service_account_email, key_file_path)
+                credentials = ee.ServiceAccountCredentials(service_account_email, _EE_KEY_PATH)
             
-            ee.Initialize(credentials, project=project_id)
-            print(f"Initialized GEE with service account: {service_account_email}")
+            ee.Initialize(credentials, project=project_id, opt_url=_EE_HIGHVOLUME_URL)
+            logger.info("Initialized GEE with service account: %s", service_account_email)
             
         else:
             # Fall back to default authentication (for local testing)
             try:
-                ee.Initialize(project=project_id)
-                print(f"Initialized GEE with default authentication for project: {project_id}")
+                ee.Initialize(project=project_id, opt_url=_EE_HIGHVOLUME_URL)
+                logger.info("Initialized GEE with default authentication for project: %s", project_id)
             except Exception as auth_error:
                 error_msg = (
                     f"Failed to initialize with default auth: {auth_error}\n"
@@ -59,199 +180,314 @@ def initialize_gee():
                 )
                 raise Exception(error_msg)
         
+        _GEE_PROJECT_ID = project_id
+        _GEE_INITIALIZED = True
         return project_id
         
     except Exception as e:
         raise Exception(f"Failed to initialize Google Earth Engine: {str(e)}")
 
+# Default Area of Interest for Amazon rainforest, built once ee is imported
+# Coordinates: [west, south, east, north] in degrees - covers central Amazon region
+_DEFAULT_BOUNDS = [-65.0, -10.0, -55.0, -2.0]
+_DEFAULT_AOI = None
+
+def _default_aoi():
+    """Return the shared default AOI geometry"""
+    global _DEFAULT_AOI
+    if _DEFAULT_AOI is None:
+        _DEFAULT_AOI = ee.Geometry.Rectangle(_DEFAULT_BOUNDS)
+    return _DEFAULT_AOI
+
+def _aoi_bounds(aoi_key):
+    """Return the AOI bounding box as [west, south, east, north], computed locally"""
+    if not aoi_key:
+        return _DEFAULT_BOUNDS
+    try:
+        aoi_data = orjson.loads(aoi_key)
+        if aoi_data['type'] == 'rectangle':
+            return [float(v) for v in aoi_data['bounds']]
+        if aoi_data['type'] == 'polygon':
+            lngs = [float(point[0]) for point in aoi_data['coordinates']]
+            lats = [float(point[1]) for point in aoi_data['coordinates']]
+            return [min(lngs), min(lats), max(lngs), max(lats)]
+    except (ValueError, KeyError, TypeError, IndexError):
+        pass
+    # Same fallback as the AOI geometry itself
+    return _DEFAULT_BOUNDS
+
+def _normalize_aoi(aoi_param):
+    """Return a canonical JSON string for a custom AOI, or None for the default AOI"""
+    if not aoi_param or not aoi_param.strip():
+        return None
+    try:
+        return orjson.dumps(orjson.loads(aoi_param), option=orjson.OPT_SORT_KEYS).decode()
+    except ValueError as e:
+        logger.warning("Error parsing custom AOI: %s", e)
+        return None
+
+# Optional DynamoDB table of precomputed tile URLs shared by all containers
+# (TILE_CACHE_TABLE); GEE map IDs are only trusted for about an hour, like the in-process cache
+_DEFAULT_TILE_URL_TTL = 3600
+_DEFAULT_PRECOMPUTE_MONTHS = 3
+_tile_table = None
+
+def _tile_cache_key(year, month, data_type, aoi_key):
+    """Return the DynamoDB key for a map query"""
+    aoi_hash = hashlib.blake2b(aoi_key.encode('utf-8'), digest_size=16).hexdigest() if aoi_key else 'default'
+    return f"{data_type}#{year}-{month:02d}#{aoi_hash}"
+
+def _get_tile_table():
+    """Return the DynamoDB table handle, or None when no table is configured"""
+    global _tile_table
+    if _tile_table is None:
+        # Read after .env is loaded so local runs can point at a table too
+        _load_env()
+        table_name = os.environ.get('TILE_CACHE_TABLE')
+        if table_name:
+            import boto3
+            _tile_table = boto3.resource('dynamodb').Table(table_name)
+    return _tile_table
+
+def _stored_tile_url(key):
+    """Return an unexpired precomputed tile URL, or None"""
+    table = _get_tile_table()
+    if table is None:
+        return None
+    try:
+        item = table.get_item(Key={'key': key}).get('Item')
+    except Exception as e:
+        logger.warning("Tile cache lookup failed: %s", e)
+        return None
+    if item and int(item['expires_at']) > time.time():
+        return item['url']
+    return None
+
+def _store_tile_url(key, url):
+    """Save a tile URL for other containers; expires_at doubles as the DynamoDB TTL attribute"""
+    table = _get_tile_table()
+    if table is None:
+        return
+    try:
+        ttl = int(os.environ.get('TILE_URL_TTL', _DEFAULT_TILE_URL_TTL))
+        table.put_item(Item={'key': key, 'url': url, 'expires_at': int(time.time()) + ttl})
+    except Exception as e:
+        logger.warning("Tile cache store failed: %s", e)
+
+@functools.lru_cache(maxsize=256)
+def _get_map_url(year, month, data_type, aoi_key, hour_bucket):
+    """Return the tile URL from the shared table, computing and storing it on a miss"""
+    key = _tile_cache_key(year, month, data_type, aoi_key)
+    tile_url = _stored_tile_url(key)
+    if tile_url is None:
+        tile_url = _compute_map_url(year, month, data_type, aoi_key)
+        if tile_url is not None:
+            _store_tile_url(key, tile_url)
+    return tile_url
+
+def _precompute_tile_urls():
+    """Refresh the shared table for the default AOI over the most recent months"""
+    if _get_tile_table() is None:
+        return {'precomputed': 0}
+    
+    initialize_gee()
+    year, month = _current_ym()
+    stored = 0
+    for _ in range(int(os.environ.get('PRECOMPUTE_MONTHS', _DEFAULT_PRECOMPUTE_MONTHS))):
+        for data_type in ('LST', 'NDVI'):
+            try:
+                tile_url = _compute_map_url(year, month, data_type, None)
+            except Exception as e:
+                logger.warning("Precompute failed for %s %d-%02d: %s", data_type, year, month, e)
+                continue
+            if tile_url is not None:
+                _store_tile_url(_tile_cache_key(year, month, data_type, None), tile_url)
+                stored += 1
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return {'precomputed': stored}
+
+def _compute_map_url(year, month, data_type, aoi_key):
+    """Return the tile URL for a map query, or None when there is no data"""
+    project_id = initialize_gee()
+    
+    # Define Area of Interest (AOI)
+    if aoi_key:
+        # Parse custom AOI from frontend
+        try:
+            aoi_data = orjson.loads(aoi_key)
+            if aoi_data['type'] == 'rectangle':
+                # Rectangle format: [west, south, east, north]
+                bounds = aoi_data['bounds']
+                aoi = ee.Geometry.Rectangle(bounds)
+            elif aoi_data['type'] == 'polygon':
+                # Polygon format: coordinates array
+                coordinates = aoi_data['coordinates']
+                aoi = ee.Geometry.Polygon([coordinates])
+            else:
+                raise ValueError("Unsupported AOI type")
+            logger.debug("Using custom AOI: %s", aoi_data['type'])
+        except Exception as e:
+            logger.warning("Error parsing custom AOI: %s", e)
+            # Fall back to default Amazon region
+            aoi = _default_aoi()
+    else:
+        aoi = _default_aoi()
+    
+    # Choose collection and processing based on data type
+    if data_type == 'LST':
+        collection = ee.ImageCollection(_LST_COLLECTION)
+    else:  # NDVI
+        collection = ee.ImageCollection(_NDVI_COLLECTION)
+    
+    # Create date range for the selected month
+    start_date, end_date = _month_range(year, month)
+    
+    # Filter by date range and AOI bounds
+    filtered_collection = collection.filterDate(start_date, end_date).filterBounds(aoi)
+    
+    # Get image based on data type
+    if data_type == 'LST':
+        # For LST, get the most recent image
+        image = filtered_collection.limit(1, 'system:time_start', False).first()
+    else:  # NDVI
+        # For NDVI, use median composite to get better coverage across AOI
+        image = filtered_collection.median()
+    
+    # Process image based on data type
+    if data_type == 'LST':
+        # Process LST data
+        lst_band = image.select('LST_Day_1km')
+        processed_image = lst_band.multiply(0.02).subtract(273.15)
+        processed_image = processed_image.focal_mean(2, 'square', 'pixels')
+        vis_params = _LST_VIS
+    else:  # NDVI
+        # Calculate NDVI (scale-invariant, so raw Sentinel-2 reflectance needs no divide)
+        # (B8 - B4) / (B8 + B4) as a single server-side operation
+        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+        processed_image = ndvi
+        vis_params = _NDVI_VIS
+    
+    # No clip(aoi): clipping masks every tile server-side, and the client limits
+    # tile requests to the AOI bounds returned with the URL instead
+    
+    # Check if any data exists while the map tiles are generated (independent requests)
+    size_future = _EE_POOL.submit(filtered_collection.size().getInfo)
+    map_future = _EE_POOL.submit(processed_image.getMapId, vis_params)
+    
+    if size_future.result() == 0:
+        return None
+    
+    # Generate map tiles
+    try:
+        map_id = map_future.result()
+    except Exception as e:
+        raise Exception(f"Failed to generate map ID: {str(e)}")
+    
+    # Check if map ID was generated successfully
+    if not map_id or not map_id.get('mapid'):
+        raise Exception(f"Failed to generate map tiles. Map ID: {map_id}")
+    
+    # Construct tile URL
+    mapid_value = map_id['mapid']
+    if '/' in mapid_value:
+        actual_mapid = mapid_value.split('/')[-1]
+    else:
+        actual_mapid = mapid_value
+    
+    if map_id.get('token'):
+        tile_url = f"https://earthengine.googleapis.com/v1/projects/{project_id}/maps/{actual_mapid}/tiles/{{z}}/{{x}}/{{y}}?token={map_id['token']}"
+    else:
+        tile_url = f"https://earthengine.googleapis.com/v1/{map_id['mapid']}/tiles/{{z}}/{{x}}/{{y}}"
+    
+    return tile_url
+
 def get_map_data(event):
     """Handle map data requests"""
     try:
         # Get parameters from query string
         query_params = event.get('queryStringParameters', {}) or {}
-        year = int(query_params.get('year', 2024))
-        month = int(query_params.get('month', 7))
-        data_type = query_params.get('type', 'LST').upper()
         aoi_param = query_params.get('aoi')  # Custom Area of Interest
         
         # Validate parameters
-        from datetime import datetime
-        current_date = datetime.now()
-        
-        if not (2000 <= year <= current_date.year):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": f"Year must be between 2000 and {current_date.year}"})
-            }
-        if not (1 <= month <= 12):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Month must be between 1 and 12"})
-            }
-        if data_type not in ['LST', 'NDVI']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Data type must be 'LST' or 'NDVI'"})
-            }
-            
-        # Don't allow future dates
-        if year == current_date.year and month > current_date.month:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Cannot request future dates"})
-            }
-        
-        # Initialize GEE and get project ID
-        project_id = initialize_gee()
-        
-        # Define Area of Interest (AOI)
-        if aoi_param and aoi_param.strip():
-            # Parse custom AOI from frontend
-            try:
-                aoi_data = json.loads(aoi_param)
-                if aoi_data['type'] == 'rectangle':
-                    # Rectangle format: [west, south, east, north]
-                    bounds = aoi_data['bounds']
-                    aoi = ee.Geometry.Rectangle(bounds)
-                elif aoi_data['type'] == 'polygon':
-                    # Polygon format: coordinates array
-                    coordinates = aoi_data['coordinates']
-                    aoi = ee.Geometry.Polygon([coordinates])
-                else:
-                    raise ValueError("Unsupported AOI type")
-                print(f"Using custom AOI: {aoi_data['type']}")
-            except Exception as e:
-                print(f"Error parsing custom AOI: {e}")
-                # Fall back to default Amazon region
-                aoi = ee.Geometry.Rectangle([-65.0, -10.0, -55.0, -2.0])
-        else:
-            # Default Area of Interest for Amazon rainforest
-            # Coordinates: [west, south, east, north] in degrees - covers central Amazon region
-            aoi = ee.Geometry.Rectangle([-65.0, -10.0, -55.0, -2.0])
-        
-        # Choose collection and processing based on data type
-        if data_type == 'LST':
-            collection = ee.ImageCollection('MODIS/061/MOD11A2')
-        else:  # NDVI
-            collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-        
-        # Create date range for the selected month
-        start_date = f'{year}-{month:02d}-01'
-        if month == 12:
-            end_date = f'{year + 1}-01-01'
-        else:
-            end_date = f'{year}-{month + 1:02d}-01'
-        
-        # Filter by date range and AOI bounds
-        filtered_collection = collection.filterDate(start_date, end_date).filterBounds(aoi)
-        
-        # Apply cloud masking for Sentinel-2 NDVI data
-        if data_type == 'NDVI':
-            def mask_s2_clouds(image):
-                # Simple approach: just scale the values and skip cloud masking for now
-                return image.divide(10000)
-            
-            filtered_collection = filtered_collection.map(mask_s2_clouds)
-        
-        # Get image based on data type
-        if data_type == 'LST':
-            # For LST, get the most recent image
-            image = filtered_collection.sort('system:time_start', False).first()
-        else:  # NDVI
-            # For NDVI, use median composite to get better coverage across AOI
-            image = filtered_collection.median()
+        year, month, data_type, error = _validate_common(query_params)
+        if error:
+            return error
         
-        # Check if image exists
-        try:
-            image_info = image.getInfo()
-            if not image_info:
-                error_msg = f"No {data_type} data available for the specified time range and location"
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({"error": error_msg})
-                }
-        except Exception as e:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": f"No data found: {str(e)}"})
-            }
-        
-        # Process image based on data type
-        if data_type == 'LST':
-            # Process LST data
-            lst_band = image.select('LST_Day_1km')
-            processed_image = lst_band.multiply(0.02).subtract(273.15)
-            processed_image = processed_image.focal_mean(2, 'square', 'pixels')
-            
-            vis_params = {
-                'min': 15,
-                'max': 40,
-                'palette': ['blue', 'yellow', 'red']
-            }
-        else:  # NDVI
-            # Calculate NDVI
-            nir = image.select('B8')
-            red = image.select('B4')
-            ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
-            processed_image = ndvi
-            
-            vis_params = {
-                'min': 0,
-                'max': 0.8,
-                'palette': ['brown', 'yellow', 'lightgreen', 'darkgreen']
-            }
+        # Initialize GEE
+        initialize_gee()
         
-        # Clip to AOI
-        processed_image = processed_image.clip(aoi)
+        # Normalize the AOI so equivalent requests share a cache entry
+        aoi_key = _normalize_aoi(aoi_param)
         
-        # Generate map tiles
+        # Cached per container; the hour bucket refreshes composites hourly
         try:
-            map_id = processed_image.getMapId(vis_params)
+            tile_url = _get_map_url(year, month, data_type, aoi_key, int(time.time() // 3600))
         except Exception as e:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": f"Failed to generate map ID: {str(e)}"})
-            }
-        
-        # Check if map ID was generated successfully
-        if not map_id or not map_id.get('mapid'):
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": f"Failed to generate map tiles. Map ID: {map_id}"})
-            }
+            return _err(500, str(e))
         
-        # Construct tile URL
-        mapid_value = map_id['mapid']
-        if '/' in mapid_value:
-            actual_mapid = mapid_value.split('/')[-1]
-        else:
-            actual_mapid = mapid_value
-        
-        if map_id.get('token'):
-            tile_url = f"https://earthengine.googleapis.com/v1/projects/{project_id}/maps/{actual_mapid}/tiles/{{z}}/{{x}}/{{y}}?token={map_id['token']}"
-        else:
-            tile_url = f"https://earthengine.googleapis.com/v1/{map_id['mapid']}/tiles/{{z}}/{{x}}/{{y}}"
+        if tile_url is None:
+            error_msg = f"No {data_type} data available for the specified time range and location"
+            return _err(404, error_msg)
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({"url": tile_url})
-        }
+        return _ok(event, {"url": tile_url, "bounds": _aoi_bounds(aoi_key)})
         
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({"error": f"Server error: {str(e)}"})
-        }
+        return _err(500, f"Server error: {str(e)}")
+
+@functools.lru_cache(maxsize=256)
+def _compute_pixel_value(lat_q, lng_q, year, month, data_type, hour_bucket):
+    """Return the collection size, pixel value and image date at a quantized point"""
+    # Create point geometry
+    point = ee.Geometry.Point([lng_q, lat_q])
+    
+    # Get data collection based on type
+    if data_type == 'LST':
+        collection = ee.ImageCollection(_LST_COLLECTION)
+    else:  # NDVI
+        collection = ee.ImageCollection(_NDVI_COLLECTION)
+    
+    # Create date range
+    start_date, end_date = _month_range(year, month)
+    
+    # Filter collection
+    filtered_collection = collection.filterDate(start_date, end_date).filterBounds(point)
+    
+    # Get the most recent image
+    image = filtered_collection.limit(1, 'system:time_start', False).first()
+    
+    # Process based on data type
+    if data_type == 'LST':
+        lst_band = image.select('LST_Day_1km')
+        processed_band = lst_band.multiply(0.02).subtract(273.15)
+        band_name = 'LST_Day_1km'
+    else:  # NDVI
+        # (B8 - B4) / (B8 + B4) as a single server-side operation
+        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+        processed_band = ndvi
+        band_name = 'NDVI'
+    
+    # Read the pixel under the point at the dataset's native resolution
+    pixel = processed_band.reduceRegion(
+        reducer=ee.Reducer.first(),
+        geometry=point,
+        scale=1000 if data_type == 'LST' else 10
+    )
+    
+    # Get image date
+    if data_type == 'LST':
+        image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd')
+    else:  # NDVI - median composite doesn't have system:time_start
+        image_date = ee.String(f"{year}-{month:02d} (composite)")
+    
+    # Resolve collection size, pixel value and image date in a single round trip.
+    # If() keeps the server from evaluating the pixel when there is no data.
+    collection_size = filtered_collection.size()
+    has_data = collection_size.gt(0)
+    return ee.Dictionary({
+        'size': collection_size,
+        'value': ee.Algorithms.If(has_data, pixel.get(band_name), None),
+        'date': ee.Algorithms.If(has_data, image_date, None)
+    }).getInfo()
 
 def get_pixel_value_data(event):
     """Handle pixel value requests"""
@@ -263,176 +499,44 @@ def get_pixel_value_data(event):
             lat = float(query_params.get('lat'))
             lng = float(query_params.get('lng'))
         except (TypeError, ValueError):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Latitude and longitude are required and must be numbers"})
-            }
-        
-        year = int(query_params.get('year', 2024))
-        month = int(query_params.get('month', 7))
-        data_type = query_params.get('type', 'LST').upper()
-        aoi_param = query_params.get('aoi')  # Custom Area of Interest
+            return _err(400, "Latitude and longitude are required and must be numbers")
         
         # Validate parameters
         if not (-90 <= lat <= 90):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Latitude must be between -90 and 90"})
-            }
+            return _err(400, "Latitude must be between -90 and 90")
         if not (-180 <= lng <= 180):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Longitude must be between -180 and 180"})
-            }
-        if data_type not in ['LST', 'NDVI']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Data type must be 'LST' or 'NDVI'"})
-            }
+            return _err(400, "Longitude must be between -180 and 180")
         
-        from datetime import datetime
-        current_date = datetime.now()
+        year, month, data_type, error = _validate_common(query_params)
+        if error:
+            return error
         
-        if not (2000 <= year <= current_date.year):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": f"Year must be between 2000 and {current_date.year}"})
-            }
-        if not (1 <= month <= 12):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Month must be between 1 and 12"})
-            }
-            
-        # Don't allow future dates
-        if year == current_date.year and month > current_date.month:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Cannot request future dates"})
-            }
-            
         # Initialize GEE
         initialize_gee()
         
-        # Create point geometry
-        point = ee.Geometry.Point([lng, lat])
-        
-        # Get data collection based on type
-        if data_type == 'LST':
-            collection = ee.ImageCollection('MODIS/061/MOD11A2')
-        else:  # NDVI
-            collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-        
-        # Create date range
-        start_date = f'{year}-{month:02d}-01'
-        if month == 12:
-            end_date = f'{year + 1}-01-01'
-        else:
-            end_date = f'{year}-{month + 1:02d}-01'
-        
-        # Filter collection
-        filtered_collection = collection.filterDate(start_date, end_date).filterBounds(point)
-        
-        # Apply cloud masking for Sentinel-2 NDVI data
-        if data_type == 'NDVI':
-            def mask_s2_clouds(image):
-                # Simple approach: just scale the values and skip cloud masking for now
-                return image.divide(10000)
-            
-            filtered_collection = filtered_collection.map(mask_s2_clouds)
-        
-        # Check if any data exists
-        collection_size = filtered_collection.size().getInfo()
-        if collection_size == 0:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    "error": f"No {data_type} data available for this location and time period",
-                    "lat": lat,
-                    "lng": lng,
-                    "year": year,
-                    "month": month,
-                    "data_type": data_type
-                })
-            }
-        
-        # Get the most recent image
-        image = filtered_collection.sort('system:time_start', False).first()
+        # Quantize to the raster resolution (~110 m for 1 km MODIS, ~11 m for 10 m Sentinel-2)
+        # so nearby clicks on the same pixel share a cache entry
+        digits = 3 if data_type == 'LST' else 4
+        lat_q = round(lat, digits)
+        lng_q = round(lng, digits)
         
-        # Process based on data type
-        if data_type == 'LST':
-            lst_band = image.select('LST_Day_1km')
-            processed_band = lst_band.multiply(0.02).subtract(273.15)
-            band_name = 'LST_Day_1km'
-        else:  # NDVI
-            nir = image.select('B8')
-            red = image.select('B4')
-            ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
-            processed_band = ndvi
-            band_name = 'NDVI'
-        
-        # Sample the image at the point
-        sample = processed_band.sample(point, 1000).first()
-        
-        # Check if sample exists
-        if sample is None:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    "error": f"No {data_type} data available at this location (possibly due to cloud cover or data gaps)",
-                    "lat": lat,
-                    "lng": lng,
-                    "year": year,
-                    "month": month,
-                    "data_type": data_type
-                })
-            }
-        
-        # Get the pixel value
+        # Cached per container; the hour bucket refreshes composites hourly
         try:
-            pixel_value = sample.get(band_name).getInfo()
+            result = _compute_pixel_value(lat_q, lng_q, year, month, data_type, int(time.time() // 3600))
         except Exception as e:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    "error": f"No {data_type} data available at this location (data processing error)",
-                    "lat": lat,
-                    "lng": lng,
-                    "year": year,
-                    "month": month,
-                    "data_type": data_type
-                })
-            }
+            return _err(404, f"No {data_type} data available at this location (data processing error)",
+                        lat=lat, lng=lng, year=year, month=month, data_type=data_type)
         
-        if pixel_value is None:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    "error": "No data available at this exact location",
-                    "lat": lat,
-                    "lng": lng,
-                    "year": year,
-                    "month": month,
-                    "data_type": data_type
-                })
-            }
+        # Check if any data exists
+        if result['size'] == 0:
+            return _err(404, f"No {data_type} data available for this location and time period",
+                        lat=lat, lng=lng, year=year, month=month, data_type=data_type)
         
-        # Get image date
-        if data_type == 'LST':
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-        else:  # NDVI - median composite doesn't have system:time_start
-            image_date = f"{year}-{month:02d} (composite)"
+        pixel_value = result['value']
+        image_date = result['date']
+        if pixel_value is None:
+            return _err(404, f"No {data_type} data available at this location (possibly due to cloud cover or data gaps)",
+                        lat=lat, lng=lng, year=year, month=month, data_type=data_type)
         
         # Format response based on data type
         if data_type == 'LST':
@@ -458,25 +562,25 @@ def get_pixel_value_data(event):
                 "message": f"NDVI Value: {round(pixel_value, 3)}"
             }
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(response_data)
-        }
+        return _ok(event, response_data)
         
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({"error": f"Error getting pixel value: {str(e)}"})
-        }
+        return _err(500, f"Error getting pixel value: {str(e)}")
 
 def lambda_handler(event, context):
     """Main Lambda handler function"""
     try:
-        # Get the HTTP method and path
-        http_method = event.get('httpMethod', 'GET')
-        path = event.get('path', '/')
+        # Scheduled (EventBridge) invocations refresh the precomputed tile URLs
+        if event.get('source') == 'aws.events':
+            return _precompute_tile_urls()
+        
+        # Get the HTTP method and path (REST API payload 1.0, or HTTP API / Function URL 2.0)
+        if event.get('version') == '2.0':
+            http_method = event.get('requestContext', {}).get('http', {}).get('method', 'GET')
+            path = event.get('rawPath', '/')
+        else:
+            http_method = event.get('httpMethod', 'GET')
+            path = event.get('path', '/')
         
         # Handle CORS preflight requests
         if http_method == 'OPTIONS':
@@ -496,15 +600,7 @@ def lambda_handler(event, context):
         elif path == '/api/pixel_value' or path.endswith('/pixel_value'):
             return get_pixel_value_data(event)
         else:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({"error": "Not found"})
-            }
+            return _err(404, "Not found")
             
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({"error": f"Lambda error: {str(e)}"})
-        }
\ No newline at end of file
+        return _err(500, f"Lambda error: {str(e)}")
\ No newline at end of file
@@ -253,6 +253,7 @@ const MapLegend = ({ dataType }) => {
 const MapDashboard = () => {
   // State management
   const [tileUrl, setTileUrl] = useState('');
+  const [tileBounds, setTileBounds] = useState(null); // Leaflet [[south, west], [north, east]]
   const [dataType, setDataType] = useState('LST'); // 'LST' or 'NDVI'
   // Initialize with previous month since current month data may not be available
   const currentDate = new Date();
@@ -307,6 +308,9 @@ const MapDashboard = () => {
       const response = await axios.get(`${apiBaseUrl}/api/map`, { params });
       
       if (response.data && response.data.url) {
+        // Backend returns [west, south, east, north]; tiles outside it are not requested
+        const bounds = response.data.bounds;
+        setTileBounds(bounds ? [[bounds[1], bounds[0]], [bounds[3], bounds[2]]] : null);
         setTileUrl(response.data.url);
       } else {
         throw new Error('Invalid response format');
@@ -315,6 +319,7 @@ const MapDashboard = () => {
       console.error(`Error fetching ${type} tile URL:`, err);
       setError(`Failed to load ${type} data. Please try again.`);
       setTileUrl('');
+      setTileBounds(null);
     } finally {
       setLoading(false);
     }
@@ -589,7 +594,9 @@ const MapDashboard = () => {
             {tileUrl && (
               <LayersControl.Overlay checked name={`${dataType} Data`}>
                 <TileLayer
+                  key={tileUrl}
                   url={tileUrl}
+                  bounds={tileBounds || undefined}
                   attribution={`${dataType} Data from Google Earth Engine`}
                   opacity={0.4}
                 />